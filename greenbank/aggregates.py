@@ -0,0 +1,136 @@
+import bisect
+import math
+from collections import Counter
+
+from . import fixedpoint
+from .batch import FIELDS
+
+
+class FleetAggregate:
+    """
+    Streaming summary of the borrowing rates of a fleet.
+
+    The aggregate is fed chunk by chunk through update() and never keeps the
+    rows themselves: its size only depends on the number of histogram bins and
+    on the number of categories in the tables, not on the size of the fleet.
+    Aggregates computed on separate parts of a fleet (in separate processes for
+    instance) can be combined with merge().
+
+    Rates are accumulated in basis points, so sums are exact integers whatever
+    the order chunks are merged in; they are only converted to percentages by summary().
+    """
+    def __init__(self, tables, bin_width=1, weight_field='kilometers'):
+        self.bin_width = bin_width
+        self.weight_field = weight_field
+        self._weight_index = FIELDS.index(weight_field)
+        self._year_bounds = list(tables.year_bounds)
+
+        self.count = 0
+        self.rate_sum = 0
+        self.weight_sum = 0
+        self.weighted_rate_sum = 0
+        self.min_rate = math.inf
+        self.max_rate = -math.inf
+        self.histogram = Counter()  # bin index -> number of rates in the bin, bins being bin_width basis points wide
+        self.energy_counts = Counter()
+        self.type_counts = Counter()
+        self.year_counts = Counter()
+
+    def _bin(self, rate):
+        return rate // self.bin_width
+
+    def _year_label(self, year):
+        # the year buckets are labelled with their upper bound:
+        i = bisect.bisect_right(self._year_bounds, year)
+        return f"<{self._year_bounds[i]}" if i < len(self._year_bounds) else None
+
+    def update(self, chunk, rates):
+        """
+        Fold a chunk of rows and their rates into the aggregate.
+        """
+        for row, rate in zip(chunk, rates):
+            weight = row[self._weight_index]
+            self.count += 1
+            self.rate_sum += rate
+            self.weight_sum += weight
+            self.weighted_rate_sum += rate * weight
+            self.min_rate = min(self.min_rate, rate)
+            self.max_rate = max(self.max_rate, rate)
+            self.histogram[self._bin(rate)] += 1
+            self.energy_counts[row[0]] += 1
+            self.type_counts[row[2]] += 1
+            self.year_counts[self._year_label(row[3])] += 1
+
+    def merge(self, other):
+        """
+        Add the contents of another aggregate to this one and return this aggregate.
+        """
+        if other.bin_width != self.bin_width or other.weight_field != self.weight_field:
+            raise ValueError("Cannot merge aggregates with different settings")
+        self.count += other.count
+        self.rate_sum += other.rate_sum
+        self.weight_sum += other.weight_sum
+        self.weighted_rate_sum += other.weighted_rate_sum
+        self.min_rate = min(self.min_rate, other.min_rate)
+        self.max_rate = max(self.max_rate, other.max_rate)
+        self.histogram.update(other.histogram)
+        self.energy_counts.update(other.energy_counts)
+        self.type_counts.update(other.type_counts)
+        self.year_counts.update(other.year_counts)
+        return self
+
+    @property
+    def mean_rate(self):
+        """
+        Mean rate, in basis points.
+        """
+        return self.rate_sum / self.count if self.count else None
+
+    @property
+    def weighted_rate(self):
+        """
+        Mean rate in basis points, weighted by the weight_field of each row.
+        """
+        return self.weighted_rate_sum / self.weight_sum if self.weight_sum else None
+
+    def rate_histogram(self):
+        """
+        The histogram of the rates as a sorted list of (bin lower bound in basis points, count) pairs.
+        """
+        return [(b * self.bin_width, n) for b, n in sorted(self.histogram.items())]
+
+    def quantile(self, q):
+        """
+        Approximate q-quantile of the rates (0 <= q <= 1), in basis points.
+        The result is precise to within one bin_width, and exact with the default width of 1.
+        """
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for b, n in sorted(self.histogram.items()):
+            seen += n
+            if seen >= target:
+                # the lower bound of the bin, clamped to the values actually observed:
+                return min(max(b * self.bin_width, self.min_rate), self.max_rate)
+        return self.max_rate
+
+    def summary(self):
+        """
+        The aggregate as a json-serializable dict, with rates converted to percentages.
+        """
+        def percent(rate):
+            return None if rate is None else fixedpoint.rate_value(rate)
+
+        return {
+            'count': self.count,
+            'mean_rate': fixedpoint.mean_rate_value(self.rate_sum, self.count) if self.count else None,
+            'weighted_rate': fixedpoint.mean_rate_value(self.weighted_rate_sum, self.weight_sum) if self.weight_sum else None,
+            'min_rate': percent(self.min_rate) if self.count else None,
+            'max_rate': percent(self.max_rate) if self.count else None,
+            'quantiles': {str(q): percent(self.quantile(q)) for q in (0.1, 0.25, 0.5, 0.75, 0.9)},
+            'histogram': [(percent(b), n) for b, n in self.rate_histogram()],
+            'energy_counts': dict(self.energy_counts),
+            'type_counts': dict(self.type_counts),
+            'year_counts': dict(self.year_counts),
+        }
@@ -1,6 +1,8 @@
+import time
+
 import pyglet
 
-from . import vehicle
+from . import fixedpoint, profiling, vehicle
 
 class Colors:
     """
@@ -433,7 +435,10 @@ class Button(Widget):
         This event is called each time the user clicks on the mouse.
         """
         if button in (pyglet.window.mouse.LEFT, pyglet.window.mouse.RIGHT) and self.collision_test(x, y):
-            self.root.calculate_result()
+            # the time until the next frame is drawn is our click-to-result latency:
+            self.root.profiler.begin_click()
+            with self.root.profiler.measure('calculate_result'):
+                self.root.calculate_result()
 
 
 
@@ -546,7 +551,12 @@ class Root(pyglet.window.Window):
 
     This contains one ParameterSelector per option to provide to the calculation process,
     as well as a 'Calculate' button to actually start the calculation.
+
+    Pressing F3 toggles an overlay showing the timings collected by our profiler,
+    and F4 exports them to a json file in the working directory.
     """
+    OVERLAY_REFRESH = 0.25  # seconds between two updates of the overlay's text
+
     def __init__(self):
         super().__init__(1024, 510, caption="Calculateur d'emprunte écologique pour voitures")
         self.widgets: list[Widget] = []
@@ -554,6 +564,17 @@ class Root(pyglet.window.Window):
         self.fields_batch = pyglet.graphics.Batch()
         self.result_batch = pyglet.graphics.Batch()
         self.current_batch = self.fields_batch
+
+        # timings of the window, and the overlay that displays them:
+        self.profiler = profiling.Profiler()
+        self.overlay_batch = pyglet.graphics.Batch()
+        self.overlay_label = pyglet.text.Label(
+            "", font_name="Courier New", font_size=9, color=Colors.LIGHT_GRAY, x=5, y=self.height - 5,
+            width=self.width - 10, multiline=True, anchor_y='top', batch=self.overlay_batch
+        )
+        self.show_overlay = False
+        self._overlay_updated = 0
+
         x = 75
         y = 350
         # the 'calculate' button:
@@ -713,7 +734,7 @@ class Root(pyglet.window.Window):
 
         # put the result inside our label:
         self.result_label.begin_update()
-        self.result_label.text = f"Votre taux d'emprunt est de {result}%."
+        self.result_label.text = f"Votre taux d'emprunt est de {fixedpoint.format_rate(result)}%."
         self.result_label.end_update()
 
         # switch to the appropriate batch:
@@ -729,63 +750,88 @@ class Root(pyglet.window.Window):
         """
         Draw the current batch to our window.
         """
-        # first, clear the window.
-        self.clear()
-        # then, draw its background color as a rectangle:
-        rect = pyglet.shapes.Rectangle(self.screen.x, self.screen.y, self.width, self.height, Colors.DARK_GRAY)
-        rect.draw()
-        self.current_batch.draw()  # draw the current batch.
+        with self.profiler.measure('on_draw'):
+            # first, clear the window.
+            self.clear()
+            # then, draw its background color as a rectangle:
+            rect = pyglet.shapes.Rectangle(self.screen.x, self.screen.y, self.width, self.height, Colors.DARK_GRAY)
+            rect.draw()
+            self.current_batch.draw()  # draw the current batch.
+        self.profiler.frame_drawn(fields_batch=self.fields_batch, result_batch=self.result_batch)
+
+        if self.show_overlay:
+            # updating the label's text is costly, so don't do it every frame:
+            now = time.perf_counter()
+            if now - self._overlay_updated > self.OVERLAY_REFRESH:
+                self.overlay_label.text = self.profiler.report()
+                self._overlay_updated = now
+            self.overlay_batch.draw()
+
+    def on_key_press(self, symbol, modifiers):
+        if symbol == pyglet.window.key.F3:
+            self.show_overlay = not self.show_overlay
+        elif symbol == pyglet.window.key.F4:
+            self.profiler.export(time.strftime("greenbank_profile_%Y%m%d_%H%M%S.json"))
+        else:
+            # keep the default behaviour (closing the window with escape):
+            super().on_key_press(symbol, modifiers)
 
     def on_mouse_motion(self, x, y, dx, dy):
-        # dispatch the event to all our child widgets:
-        self.calc_button.on_mouse_motion(x, y, dx, dy)
-        for w in self.widgets:
-            if w.on_mouse_motion(x, y, dx, dy):
-                break
+        with self.profiler.measure('on_mouse_motion'):
+            # dispatch the event to all our child widgets:
+            self.calc_button.on_mouse_motion(x, y, dx, dy)
+            for w in self.widgets:
+                if w.on_mouse_motion(x, y, dx, dy):
+                    break
 
     def on_mouse_press(self, x, y, button, modifiers):
         # don't dispatch if the mouse button is not left of right:
         if button not in (pyglet.window.mouse.LEFT, pyglet.window.mouse.RIGHT):
             return
-        # Widgets acquire the focus when they are clicked, and
-        # they don't already have the focus. They lose the focus
-        # if they have the focus and the user clicks somewhere else.
-        for i in range(len(self.widgets)):
-            w = self.widgets[i]
-            if w.collision_test(x, y) and self._focused != i:
-                w.begin_focus(x, y)
-                self._focused = i
-                break
-            if self._focused >= 0:
-                self.widgets[self._focused].end_focus(x, y)
-                self._focused = -1
-
-        # dispatch the event to our 'calculate' button:
-        self.calc_button.on_mouse_press(x, y, button, modifiers)
+        with self.profiler.measure('on_mouse_press'):
+            # Widgets acquire the focus when they are clicked, and
+            # they don't already have the focus. They lose the focus
+            # if they have the focus and the user clicks somewhere else.
+            for i in range(len(self.widgets)):
+                w = self.widgets[i]
+                if w.collision_test(x, y) and self._focused != i:
+                    w.begin_focus(x, y)
+                    self._focused = i
+                    break
+                if self._focused >= 0:
+                    self.widgets[self._focused].end_focus(x, y)
+                    self._focused = -1
+
+            # dispatch the event to our 'calculate' button:
+            self.calc_button.on_mouse_press(x, y, button, modifiers)
 
     def on_mouse_drag(self, x, y, dx, dy, buttons, modifiers):
         # dispatch the event to the widget that has the focus, if any:
         if self._focused < 0:
             return
-        self.widgets[self._focused].on_mouse_drag(x, y, dx, dy, buttons, modifiers)
+        with self.profiler.measure('on_mouse_drag'):
+            self.widgets[self._focused].on_mouse_drag(x, y, dx, dy, buttons, modifiers)
 
     def on_text(self, text):
         # dispatch the event to the widget that has the focus, if any:
         if self._focused < 0:
             return
-        self.widgets[self._focused].on_text(text)
+        with self.profiler.measure('on_text'):
+            self.widgets[self._focused].on_text(text)
 
     def on_text_motion(self, motion):
         # dispatch the event to the widget that has the focus, if any:
         if self._focused < 0:
             return
-        self.widgets[self._focused].on_text_motion(motion)
+        with self.profiler.measure('on_text_motion'):
+            self.widgets[self._focused].on_text_motion(motion)
 
     def on_text_motion_select(self, motion):
         # dispatch the event to the widget that has the focus, if any:
         if self._focused < 0:
             return
-        self.widgets[self._focused].on_text_motion_select(motion)
+        with self.profiler.measure('on_text_motion_select'):
+            self.widgets[self._focused].on_text_motion_select(motion)
 
 
 def run():
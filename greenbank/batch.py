@@ -0,0 +1,123 @@
+import csv
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .dedupe import DedupScorer
+from .tables import RateTables
+
+
+# the fields of a fleet row, in the order of the Vehicle constructor's parameters:
+FIELDS = ('energy', 'kilometers', 'type', 'year', 'passenger_count')
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+def parse_row(record):
+    """
+    Convert a record read from a fleet file (a dict of strings or json values)
+    to a row tuple following the order of FIELDS.
+    """
+    return (
+        record['energy'],
+        int(record['kilometers']),
+        record['type'],
+        int(record['year']),
+        int(record['passenger_count']),
+    )
+
+
+def read_records(path):
+    """
+    Iterate over the raw records of a fleet file, as dicts.
+    Both csv files (with a header line naming the FIELDS) and json lines files are supported.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, newline='', encoding='utf-8') as fs:
+        if ext == '.csv':
+            yield from csv.DictReader(fs)
+        elif ext in ('.jsonl', '.ndjson'):
+            for line in fs:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            raise ValueError(f"Unsupported fleet file format: '{ext}'")
+
+
+def read_rows(path):
+    """
+    Iterate over the rows of a fleet file (see read_records()).
+    """
+    for record in read_records(path):
+        yield parse_row(record)
+
+
+def chunked(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Group the provided rows into lists of at most chunk_size rows.
+    """
+    it = iter(rows)
+    while True:
+        chunk = list(itertools.islice(it, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def score_chunk(chunk, tables):
+    """
+    Calculate the borrowing rate of every row of the chunk.
+    """
+    return [tables.borrowing_rate(*row) for row in chunk]
+
+
+def score_chunks(rows, tables=None, chunk_size=DEFAULT_CHUNK_SIZE, dedupe=False):
+    """
+    Score the provided rows chunk by chunk, yielding (chunk, rates) pairs.
+    Only one chunk is held in memory at a time.
+    If dedupe is true, the rows are scored through a dedupe.DedupScorer instead,
+    which can be passed as well to read its stats afterwards.
+    """
+    if tables is None:
+        tables = RateTables.load()
+    if dedupe is True:
+        dedupe = DedupScorer(tables)
+    for chunk in chunked(rows, chunk_size):
+        yield chunk, dedupe.score(chunk) if dedupe else score_chunk(chunk, tables)
+
+
+def _aggregate_chunk(chunk, tables, make_aggregate):
+    # run inside worker processes: score one chunk into a fresh aggregate.
+    aggregate = make_aggregate(tables)
+    aggregate.update(chunk, score_chunk(chunk, tables))
+    return aggregate
+
+
+def aggregate_fleet(rows, make_aggregate, tables=None, chunk_size=DEFAULT_CHUNK_SIZE, workers=1):
+    """
+    Score the provided rows and fold the results into an aggregate created with
+    make_aggregate(tables) (for instance aggregates.FleetAggregate).
+    The aggregate is updated chunk by chunk. When workers > 1, chunks are scored
+    in separate processes and the partial aggregates are merged back together,
+    in which case make_aggregate must be picklable.
+    """
+    if tables is None:
+        tables = RateTables.load()
+    result = make_aggregate(tables)
+
+    if workers <= 1:
+        for chunk, rates in score_chunks(rows, tables, chunk_size):
+            result.update(chunk, rates)
+        return result
+
+    with ProcessPoolExecutor(workers) as executor:
+        pending = []
+        for chunk in chunked(rows, chunk_size):
+            pending.append(executor.submit(_aggregate_chunk, chunk, tables, make_aggregate))
+            # don't let more chunks than workers wait in memory:
+            if len(pending) >= 2 * workers:
+                result.merge(pending.pop(0).result())
+        for future in pending:
+            result.merge(future.result())
+    return result
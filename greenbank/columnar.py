@@ -0,0 +1,262 @@
+import json
+import os
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from . import batch
+from .dedupe import DedupStats
+from .tables import RateTables
+from .vehicle import Vehicle
+
+
+# the on-disk type of every column of a columnar fleet.
+# energy and type are stored as codes into the category dictionary.
+COLUMN_DTYPES = {
+    'energy': np.uint8,
+    'kilometers': np.int32,
+    'type': np.uint8,
+    'year': np.int16,
+    'passenger_count': np.int8,
+}
+CATEGORICAL = ('energy', 'type')
+CATEGORIES_FILE = "categories.json"
+RATES_FILE = "rates.npy"
+# rates are written in basis points (see the fixedpoint module):
+RATE_DTYPE = np.int32
+
+
+class ColumnarFleet:
+    """
+    A fleet stored as one .npy file per Vehicle field in a directory, plus a
+    json dictionary giving the names behind the energy and type codes.
+
+    Columns are memory-mapped read-only: opening a fleet reads no row, and
+    slicing a column only pages in the part of the file that is used.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, CATEGORIES_FILE), encoding='utf-8') as fs:
+            self.categories = json.load(fs)
+        self.columns = {
+            name: np.load(self.path(name), mmap_mode='r') for name in COLUMN_DTYPES
+        }
+
+    def path(self, name):
+        return os.path.join(self.directory, f"{name}.npy")
+
+    def __len__(self):
+        return len(self.columns['energy'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    @property
+    def rates(self):
+        """
+        The memory-mapped rates (in basis points) written by score_columnar(), or None if the fleet wasn't scored yet.
+        """
+        return self.open_rates()
+
+    def open_rates(self, writable=False):
+        """
+        Memory-map the rates of the fleet, read-only unless writable is true, in which case
+        assignments are written back to rates.npy (see incremental.FleetIndex.update()).
+        Returns None if the fleet wasn't scored yet.
+        """
+        path = os.path.join(self.directory, RATES_FILE)
+        if not os.path.exists(path):
+            return None
+        return np.load(path, mmap_mode='r+' if writable else 'r')
+
+    def rows(self, start=0, stop=None):
+        """
+        Iterate over the rows of the fleet as tuples following batch.FIELDS.
+        """
+        stop = len(self) if stop is None else stop
+        energies = self.categories['energy']
+        types = self.categories['type']
+        columns = [self.columns[name][start:stop].tolist() for name in batch.FIELDS]
+        for energy, kilometers, vehicle_type, year, passengers in zip(*columns):
+            yield energies[energy], kilometers, types[vehicle_type], year, passengers
+
+
+def _check_range(values, name, dtype, first_row):
+    # numpy would raise an OverflowError (or silently wrap) for values that don't fit the column:
+    info = np.iinfo(dtype)
+    if info.min <= min(values) and max(values) <= info.max:
+        return
+    for i, value in enumerate(values):
+        if not info.min <= value <= info.max:
+            raise ValueError(
+                f"Row {first_row + i}: {name} value {value} is out of the range of the column ({info.min} to {info.max})"
+            )
+
+
+def convert(source, directory, chunk_size=batch.DEFAULT_CHUNK_SIZE):
+    """
+    Convert a csv or json lines fleet file (see batch.read_rows()) to a columnar fleet.
+    The source is read chunk by chunk, so the whole fleet never needs to fit in memory.
+    """
+    os.makedirs(directory, exist_ok=True)
+    categories = {name: [] for name in CATEGORICAL}
+    codes = {name: {} for name in CATEGORICAL}
+
+    # the number of rows is only known at the end, so columns are first
+    # appended to raw binary files, then wrapped into .npy files.
+    raw_paths = {name: os.path.join(directory, f"{name}.raw") for name in COLUMN_DTYPES}
+    raw_files = {name: open(path, 'wb') for name, path in raw_paths.items()}
+    count = 0
+    try:
+        for chunk in batch.chunked(batch.read_rows(source), chunk_size):
+            columns = dict(zip(batch.FIELDS, zip(*chunk)))
+            for name in CATEGORICAL:
+                mapping = codes[name]
+                for value in set(columns[name]).difference(mapping):
+                    if len(mapping) > np.iinfo(COLUMN_DTYPES[name]).max:
+                        raise ValueError(f"Too many distinct values in column '{name}'")
+                    mapping[value] = len(categories[name])
+                    categories[name].append(value)
+                columns[name] = [mapping[value] for value in columns[name]]
+            for name, dtype in COLUMN_DTYPES.items():
+                _check_range(columns[name], name, dtype, count)
+                np.asarray(columns[name], dtype=dtype).tofile(raw_files[name])
+            count += len(chunk)
+    except BaseException:
+        # don't leave a half-built fleet behind:
+        for fs in raw_files.values():
+            fs.close()
+        for path in raw_paths.values():
+            os.remove(path)
+        raise
+    for fs in raw_files.values():
+        fs.close()
+
+    # the whole source was read and checked: rates left over from a previous
+    # fleet in this directory would no longer match the new rows.
+    rates_path = os.path.join(directory, RATES_FILE)
+    if os.path.exists(rates_path):
+        os.remove(rates_path)
+
+    for name, dtype in COLUMN_DTYPES.items():
+        raw = np.memmap(raw_paths[name], dtype=dtype, mode='r', shape=(count,)) if count else np.empty(0, dtype)
+        out = open_memmap(os.path.join(directory, f"{name}.npy"), mode='w+', dtype=dtype, shape=(count,))
+        for start in range(0, count, chunk_size):
+            out[start:start + chunk_size] = raw[start:start + chunk_size]
+        out.flush()
+        del raw, out
+        os.remove(raw_paths[name])
+
+    with open(os.path.join(directory, CATEGORIES_FILE), 'w', encoding='utf-8') as fs:
+        json.dump(categories, fs, ensure_ascii=False, indent=2)
+    return ColumnarFleet(directory)
+
+
+def _lookup(values):
+    # integers have no NaN, so the values that aren't covered by the tables (None)
+    # are flagged in a separate boolean array.
+    values = list(values)
+    table = np.array([0 if v is None else v for v in values], dtype=np.int32)
+    covered = np.array([v is not None for v in values], dtype=bool)
+    return table, covered
+
+
+def _take(lookup, indices):
+    table, covered = lookup
+    return table[indices], covered[indices]
+
+
+def _threshold_lookup(bounds, grades, values, side):
+    # vectorized version of the bisections done by RateTables:
+    i = np.searchsorted(np.asarray(bounds), values, side=side)
+    return _take(_lookup(list(grades) + [None]), i)
+
+
+def score_arrays(tables, categories, energy, kilometers, vehicle_type, year, passenger_count, first_row=0):
+    """
+    Calculate the borrowing rates (in basis points) of columns of codes and numbers,
+    the same way RateTables.borrowing_rate() does.
+    Raises ValueError if a row isn't covered by the tables, numbering rows from first_row.
+    """
+    energy_grades, energy_ok = _take(_lookup(tables.energy_grade(e) for e in categories['energy']), energy)
+    vehicle_grades, vehicle_ok = _take(_lookup(tables.vehicle_grade(t) for t in categories['type']), vehicle_type)
+    # kilometers / 1000 < bound is the same as kilometers < bound * 1000 for whole kilometers:
+    kilometer_bounds = np.asarray(tables.kilometer_bounds, dtype=np.int64) * 1000
+    kilometer_grades, kilometer_ok = _threshold_lookup(kilometer_bounds, tables.kilometer_grades, kilometers, 'right')
+    year_grades, year_ok = _threshold_lookup(tables.year_bounds, tables.year_grades, year, 'right')
+
+    grades = energy_grades + kilometer_grades + vehicle_grades + year_grades
+    base_rates, base_ok = _threshold_lookup(tables.base_rate_bounds, tables.base_rates, grades, 'left')
+
+    max_passengers = max(tables.passenger_rates, default=0)
+    passenger_lookup = _lookup(tables.passenger_rate(n) for n in range(max_passengers + 2))
+    passenger_rates, passenger_ok = _take(passenger_lookup, np.clip(passenger_count, 0, max_passengers + 1))
+
+    covered = energy_ok & vehicle_ok & kilometer_ok & year_ok & base_ok & passenger_ok
+    invalid = np.flatnonzero(~covered)
+    if len(invalid):
+        raise ValueError(f"Row {first_row + invalid[0]}: not covered by the tables")
+    return (base_rates + passenger_rates).astype(RATE_DTYPE)
+
+
+def score_columnar(directory, tables=None, chunk_size=batch.DEFAULT_CHUNK_SIZE):
+    """
+    Score a columnar fleet and write its rates to a memory-mapped rates.npy in the same directory.
+    Returns the memory-mapped rates.
+    """
+    if tables is None:
+        tables = RateTables.load()
+    fleet = ColumnarFleet(directory)
+    n = len(fleet)
+    rates = open_memmap(os.path.join(directory, RATES_FILE), mode='w+', dtype=RATE_DTYPE, shape=(n,))
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        rates[start:stop] = score_arrays(
+            tables, fleet.categories, *(fleet[name][start:stop] for name in batch.FIELDS), first_row=start
+        )
+    rates.flush()
+    return rates
+
+
+def score_columnar_deduplicated(directory, tables=None, chunk_size=batch.DEFAULT_CHUNK_SIZE):
+    """
+    Like score_columnar(), but every chunk is reduced to its distinct bucket tuples
+    (see dedupe.bucket_key()), which are scored once through Vehicle and scattered
+    back to the rows. Returns the memory-mapped rates and the DedupStats of the fleet.
+    """
+    if tables is None:
+        tables = RateTables.load()
+    fleet = ColumnarFleet(directory)
+    n = len(fleet)
+    rates = open_memmap(os.path.join(directory, RATES_FILE), mode='w+', dtype=RATE_DTYPE, shape=(n,))
+    known = {}  # bucket tuple (as codes) -> rate
+    kilometer_bounds = np.asarray(tables.kilometer_bounds, dtype=np.int64) * 1000
+    year_bounds = np.asarray(tables.year_bounds)
+
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        kilometers = fleet['kilometers'][start:stop]
+        year = fleet['year'][start:stop]
+        keys = np.stack([
+            fleet['energy'][start:stop],
+            np.searchsorted(kilometer_bounds, kilometers, side='right'),
+            fleet['type'][start:stop],
+            np.searchsorted(year_bounds, year, side='right'),
+            fleet['passenger_count'][start:stop],
+        ], axis=1).astype(np.int64)
+        unique_keys, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+
+        unique_rates = np.empty(len(unique_keys), dtype=RATE_DTYPE)
+        for i, key in enumerate(map(tuple, unique_keys.tolist())):
+            if key not in known:
+                # the first row of the bucket in this chunk represents the whole bucket:
+                row = next(fleet.rows(start + first[i], start + first[i] + 1))
+                try:
+                    known[key] = Vehicle(*row, tables=tables).calculate_borrowing_rate()
+                except ValueError as e:
+                    raise ValueError(f"Row {start + first[i]}: {e}") from None
+            unique_rates[i] = known[key]
+        rates[start:stop] = unique_rates[inverse.reshape(-1)]
+
+    rates.flush()
+    return rates, DedupStats(n, len(known))
@@ -0,0 +1,174 @@
+import bisect
+import csv
+import math
+
+from . import batch, fixedpoint
+from .tables import RateTables
+from .vehicle import Vehicle
+
+
+def load_table_sets(directories):
+    """
+    Load several table sets side by side from a {name: data directory} dict.
+    """
+    return {name: RateTables.load(directory) for name, directory in directories.items()}
+
+
+class JointBuckets:
+    """
+    Buckets rows against several table sets at once.
+
+    The kilometer and year thresholds of all the sets are merged, so that a
+    single bisection per row gives a bucket that falls in exactly one bucket
+    of every set: rows with the same joint key have the same rate in each set.
+    """
+    def __init__(self, table_sets):
+        self.kilometer_bounds = sorted({b for t in table_sets for b in t.kilometer_bounds})
+        self.year_bounds = sorted({b for t in table_sets for b in t.year_bounds})
+
+    def key(self, row):
+        energy, kilometers, vehicle_type, year, passengers = row
+        return (
+            energy,
+            bisect.bisect_right(self.kilometer_bounds, kilometers / 1000),
+            vehicle_type,
+            bisect.bisect_right(self.year_bounds, year),
+            passengers,
+        )
+
+
+class SetSummary:
+    """
+    Summary of the differences between one table set and the baseline.
+    """
+    def __init__(self):
+        self.count = 0  # rows covered by both this set and the baseline
+        self.uncovered = 0  # rows that this set or the baseline can't score
+        self.changed = 0
+        # rates and deltas are summed in basis points:
+        self.rate_sum = 0
+        self.delta_sum = 0
+        self.abs_delta_sum = 0
+        self.min_delta = math.inf
+        self.max_delta = -math.inf
+
+    def update(self, rate, delta):
+        if delta is None:
+            self.uncovered += 1
+            return
+        self.count += 1
+        self.rate_sum += rate
+        self.delta_sum += delta
+        self.abs_delta_sum += abs(delta)
+        self.min_delta = min(self.min_delta, delta)
+        self.max_delta = max(self.max_delta, delta)
+        if delta:
+            self.changed += 1
+
+    def as_dict(self):
+        """
+        The summary as a json-serializable dict, with rates and deltas converted to percentages.
+        """
+        if not self.count:
+            return {'count': 0, 'uncovered': self.uncovered, 'changed': 0}
+        percent = fixedpoint.rate_value
+        mean = fixedpoint.mean_rate_value
+        return {
+            'count': self.count,
+            'uncovered': self.uncovered,
+            'changed': self.changed,
+            'mean_rate': mean(self.rate_sum, self.count),
+            'mean_delta': mean(self.delta_sum, self.count),
+            'mean_abs_delta': mean(self.abs_delta_sum, self.count),
+            'min_delta': percent(self.min_delta),
+            'max_delta': percent(self.max_delta),
+        }
+
+
+class Comparison:
+    """
+    Scores rows against several named table sets in a single pass.
+
+    Every row is parsed and bucketed once; each distinct joint bucket is
+    then scored once per set through Vehicle. Deltas are given relative to
+    the baseline set (the first one unless specified otherwise).
+    """
+    def __init__(self, table_sets, baseline=None):
+        self.table_sets = dict(table_sets)
+        self.names = list(self.table_sets)
+        self.baseline = baseline if baseline is not None else self.names[0]
+        if self.baseline not in self.table_sets:
+            raise ValueError(f"Unknown baseline table set: '{self.baseline}'")
+        self.buckets = JointBuckets(self.table_sets.values())
+        self.rates = {}  # joint key -> tuple of rates, one per set (None if not covered)
+        self.summaries = {name: SetSummary() for name in self.names}
+
+    def _score_key(self, row):
+        rates = []
+        for name in self.names:
+            try:
+                rates.append(Vehicle(*row, tables=self.table_sets[name]).calculate_borrowing_rate())
+            except ValueError:
+                # the row isn't covered by this table set:
+                rates.append(None)
+        return tuple(rates)
+
+    def score(self, chunk):
+        """
+        Score a chunk of rows against every set.
+        Returns a {name: rates} dict and a {name: deltas to the baseline} dict, in basis points.
+        """
+        rates = self.rates
+        per_row = []
+        for row in chunk:
+            key = self.buckets.key(row)
+            if key not in rates:
+                rates[key] = self._score_key(row)
+            per_row.append(rates[key])
+
+        base_index = self.names.index(self.baseline)
+        result = {}
+        deltas = {}
+        for i, name in enumerate(self.names):
+            summary = self.summaries[name]
+            result[name] = [r[i] for r in per_row]
+            deltas[name] = []
+            for r in per_row:
+                base = r[base_index]
+                delta = None if r[i] is None or base is None else r[i] - base
+                deltas[name].append(delta)
+                summary.update(r[i], delta)
+        return result, deltas
+
+    def summary(self):
+        """
+        Summary diff statistics of every set against the baseline.
+        """
+        return {name: summary.as_dict() for name, summary in self.summaries.items()}
+
+
+def write_comparison(source, destination, table_sets, baseline=None, chunk_size=batch.DEFAULT_CHUNK_SIZE):
+    """
+    Score a fleet file against all the table sets and write a csv with the rows,
+    one rate column per set and one delta column per non-baseline set.
+    Returns the summary diff statistics.
+    """
+    def percent(rate):
+        return "" if rate is None else fixedpoint.format_rate(rate)
+
+    comparison = Comparison(table_sets, baseline)
+    others = [name for name in comparison.names if name != comparison.baseline]
+    with open(destination, 'w', newline='', encoding='utf-8') as fs:
+        writer = csv.writer(fs)
+        writer.writerow(
+            list(batch.FIELDS) + [f"rate_{name}" for name in comparison.names] + [f"delta_{name}" for name in others]
+        )
+        for chunk in batch.chunked(batch.read_rows(source), chunk_size):
+            rates, deltas = comparison.score(chunk)
+            for i, row in enumerate(chunk):
+                writer.writerow(
+                    list(row) +
+                    [percent(rates[name][i]) for name in comparison.names] +
+                    [percent(deltas[name][i]) for name in others]
+                )
+    return comparison.summary()
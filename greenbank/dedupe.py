@@ -0,0 +1,72 @@
+from .tables import RateTables
+from .vehicle import Vehicle
+
+
+class DedupStats:
+    """
+    How much a batch shrank once its rows were reduced to distinct bucket tuples.
+    """
+    def __init__(self, rows=0, unique=0):
+        self.rows = rows
+        self.unique = unique
+
+    @property
+    def ratio(self):
+        """
+        Number of rows per distinct tuple actually scored.
+        """
+        return self.rows / self.unique if self.unique else 1.0
+
+    def __repr__(self):
+        return f"DedupStats(rows={self.rows}, unique={self.unique}, ratio={self.ratio:.1f})"
+
+
+def bucket_key(row, tables):
+    """
+    The bucket tuple of a row: (energy, kilometer bucket, type, year bucket, passenger count).
+    Two rows with the same bucket tuple always have the same borrowing rate.
+    """
+    energy, kilometers, vehicle_type, year, passengers = row
+    return energy, tables.kilometer_bucket(kilometers), vehicle_type, tables.year_bucket(year), passengers
+
+
+class DedupScorer:
+    """
+    Scores rows by reducing them to bucket tuples and running each distinct
+    tuple only once through Vehicle, then scattering the results back to
+    the rows' order.
+
+    The rates of the tuples already seen are kept between calls, so a scorer
+    can be reused for all the chunks of a fleet. Its size is bounded by the
+    number of distinct tuples, not by the number of rows.
+    """
+    def __init__(self, tables=None):
+        self.tables = tables if tables is not None else RateTables.load()
+        self.rates = {}  # bucket tuple -> rate
+        self.stats = DedupStats()
+
+    def score(self, rows):
+        """
+        Return the rates of the provided rows, in the same order.
+        """
+        rates = self.rates
+        keys = []
+        for row in rows:
+            key = bucket_key(row, self.tables)
+            if key not in rates:
+                # any row of the bucket represents the whole bucket:
+                rates[key] = Vehicle(*row, tables=self.tables).calculate_borrowing_rate()
+            keys.append(key)
+        self.stats.rows += len(keys)
+        self.stats.unique = len(rates)
+        return [rates[key] for key in keys]
+
+
+def score_deduplicated(rows, tables=None):
+    """
+    Score the provided rows through a DedupScorer.
+    Returns the rates and the DedupStats of the batch.
+    """
+    scorer = DedupScorer(tables)
+    rates = scorer.score(rows)
+    return rates, scorer.stats
@@ -0,0 +1,67 @@
+# Fixed-point representation of grades and rates.
+# Grades are stored as integer tenths of a point and rates as integer basis
+# points (hundredths of a percent), so that calculations are exact, results
+# compare and hash exactly, and fit in small integer columns.
+# Values are converted from the decimal numbers of the data files when the
+# tables are loaded, and only formatted back to decimals for display.
+
+GRADE_SCALE = 10  # tenths of a point
+RATE_SCALE = 100  # basis points per percent
+MEAN_DIGITS = 4  # decimals of the mean rates displayed, in percent (hundredths of a basis point)
+
+
+def _to_fixed(value, scale):
+    scaled = round(float(value) * scale)
+    if abs(scaled - float(value) * scale) > 1e-6:
+        raise ValueError(f"{value} can't be represented exactly with a precision of 1/{scale}")
+    return scaled
+
+
+def to_grade(value):
+    """
+    Convert a decimal grade (as found in the data files) to tenths.
+    """
+    return _to_fixed(value, GRADE_SCALE)
+
+
+def to_rate(value):
+    """
+    Convert a decimal percentage (as found in the data files) to basis points.
+    """
+    return _to_fixed(value, RATE_SCALE)
+
+
+def _from_fixed(value, scale):
+    # whole numbers are given back as ints, like they were written in the data files:
+    return value // scale if value % scale == 0 else value / scale
+
+
+def grade_value(tenths):
+    """
+    Convert a grade in tenths back to a decimal number.
+    """
+    return _from_fixed(tenths, GRADE_SCALE)
+
+
+def rate_value(basis_points):
+    """
+    Convert a rate in basis points back to a decimal percentage.
+    """
+    return _from_fixed(basis_points, RATE_SCALE)
+
+
+def mean_rate_value(total, count, digits=MEAN_DIGITS):
+    """
+    Convert the mean of rates summed in basis points to a decimal percentage,
+    rounded to the provided number of decimals so no float noise is shown.
+    """
+    return round(total / count / RATE_SCALE, digits)
+
+
+def format_rate(basis_points):
+    """
+    Format a rate in basis points as a percentage with two decimals, without the '%' sign.
+    """
+    sign = "-" if basis_points < 0 else ""
+    units, hundredths = divmod(abs(basis_points), RATE_SCALE)
+    return f"{sign}{units}.{hundredths:02d}"
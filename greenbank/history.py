@@ -0,0 +1,127 @@
+import bisect
+import datetime
+import os
+from collections import OrderedDict
+
+from . import batch
+from .dedupe import DedupScorer
+from .tables import RateTables
+
+
+def parse_date(value):
+    """
+    Accept either a date or an ISO formatted (YYYY-MM-DD) string.
+    """
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(value)
+
+
+class TableStore:
+    """
+    A set of dated snapshots of the six tables.
+
+    A snapshot is in force from its effective date until the effective date
+    of the next one. Dates are kept sorted, so resolving the snapshot in force
+    at a given date is a bisection. The tables of a snapshot are only loaded
+    when first needed, and at most cache_size of them are kept in memory
+    (least recently used ones are dropped first), along with the rates of the
+    bucket tuples already scored against them.
+    """
+    def __init__(self, snapshots, cache_size=8):
+        # snapshots is a {effective date: data directory} dict.
+        items = sorted((parse_date(d), directory) for d, directory in snapshots.items())
+        if not items:
+            raise ValueError("A table store needs at least one snapshot")
+        self.dates = [d for d, _ in items]
+        self.directories = [directory for _, directory in items]
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # snapshot index -> DedupScorer
+
+    @classmethod
+    def from_directory(cls, root, cache_size=8):
+        """
+        Create a store from a directory containing one YYYY-MM-DD sub-directory per snapshot.
+        """
+        snapshots = {}
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if os.path.isdir(path):
+                try:
+                    snapshots[parse_date(name)] = path
+                except ValueError:
+                    continue
+        return cls(snapshots, cache_size)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def resolve(self, date):
+        """
+        Index of the snapshot in force at the provided date.
+        """
+        i = bisect.bisect_right(self.dates, parse_date(date)) - 1
+        if i < 0:
+            raise ValueError(f"No tables in force on {date}, the first snapshot is from {self.dates[0]}")
+        return i
+
+    def scorer(self, index):
+        """
+        The DedupScorer of the snapshot at the provided index, loading its tables if needed.
+        """
+        scorer = self._cache.get(index, None)
+        if scorer is not None:
+            self._cache.move_to_end(index)
+            return scorer
+        scorer = DedupScorer(RateTables.load(self.directories[index]))
+        self._cache[index] = scorer
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return scorer
+
+    def tables_at(self, date):
+        """
+        The tables in force at the provided date.
+        """
+        return self.scorer(self.resolve(date)).tables
+
+    def score(self, rows, dates):
+        """
+        Score each row against the tables in force at its date.
+        Rows are grouped by snapshot so each group is scored in one go.
+        """
+        groups = {}  # snapshot index -> positions of its rows
+        resolved = {}  # loans often share dates, so don't bisect twice for the same one
+        for position, date in enumerate(dates):
+            index = resolved.get(date, None)
+            if index is None:
+                index = resolved[date] = self.resolve(date)
+            groups.setdefault(index, []).append(position)
+
+        rates = [None] * len(rows)
+        for index, positions in groups.items():
+            group_rates = self.scorer(index).score([rows[p] for p in positions])
+            for p, rate in zip(positions, group_rates):
+                rates[p] = rate
+        return rates
+
+
+def read_dated_rows(path, date_field='date'):
+    """
+    Iterate over the (row, effective date) pairs of a fleet file
+    having an additional date column (see batch.read_records()).
+    """
+    for record in batch.read_records(path):
+        yield batch.parse_row(record), parse_date(record[date_field])
+
+
+def score_dated_chunks(dated_rows, store, chunk_size=batch.DEFAULT_CHUNK_SIZE):
+    """
+    Score (row, effective date) pairs chunk by chunk against a TableStore,
+    yielding (chunk of rows, rates) pairs like batch.score_chunks() does.
+    """
+    for chunk in batch.chunked(dated_rows, chunk_size):
+        rows = [row for row, _ in chunk]
+        yield rows, store.score(rows, [date for _, date in chunk])
@@ -0,0 +1,145 @@
+import json
+
+from .dedupe import bucket_key
+from .tables import RateTables
+
+
+def _changed_keys(old, new):
+    # the keys of two dicts whose values differ, including added and removed ones:
+    return {k for k in old.keys() | new.keys() if old.get(k, None) != new.get(k, None)}
+
+
+def _changed_indices(old, new):
+    # same as above, for two lists of grades sharing the same bounds:
+    return {i for i in range(len(old)) if old[i] != new[i]}
+
+
+class RowMove:
+    """
+    A row whose rate (in basis points) changed after a table update.
+    """
+    def __init__(self, row_id, old_rate, new_rate):
+        self.row_id = row_id
+        self.old_rate = old_rate
+        self.new_rate = new_rate
+
+    def __repr__(self):
+        return f"RowMove({self.row_id}, {self.old_rate} -> {self.new_rate})"
+
+
+class FleetIndex:
+    """
+    Persisted index of a fleet, from bucket tuples to the ids (positions) of
+    the rows that fall in them, along with the rate of every tuple and the
+    tables these rates were calculated with.
+
+    When the tables change, only the tuples touched by the changed entries are
+    recalculated, and only the rows of the tuples whose rate actually moved
+    are reported, so the cost of an update is proportional to its impact
+    rather than to the size of the fleet.
+    """
+    def __init__(self, tables, buckets, rates):
+        self.tables = tables
+        self.buckets = buckets  # bucket tuple -> list of row ids
+        self.rates = rates  # bucket tuple -> rate in basis points (None if not covered)
+
+    @classmethod
+    def build(cls, rows, tables=None):
+        """
+        Index the provided rows, which are identified by their position.
+        """
+        if tables is None:
+            tables = RateTables.load()
+        buckets = {}
+        for row_id, row in enumerate(rows):
+            buckets.setdefault(bucket_key(row, tables), []).append(row_id)
+        rates = {key: tables.bucket_rate(*key) for key in buckets}
+        return cls(tables, buckets, rates)
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as fs:
+            json.dump({
+                'tables': self.tables.as_dict(),
+                'buckets': [[list(key), self.rates[key], row_ids] for key, row_ids in self.buckets.items()],
+            }, fs, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as fs:
+            data = json.load(fs)
+        buckets = {}
+        rates = {}
+        for key, rate, row_ids in data['buckets']:
+            key = tuple(key)
+            buckets[key] = row_ids
+            rates[key] = rate
+        return cls(RateTables(**data['tables']), buckets, rates)
+
+    def affected_keys(self, tables):
+        """
+        The bucket tuples whose rate may differ between the indexed tables and the provided ones.
+        Raises ValueError if the kilometer or year thresholds moved, since the bucket
+        tuples themselves are no longer valid then and the index has to be rebuilt.
+        """
+        old = self.tables
+        if old.kilometer_bounds != tables.kilometer_bounds or old.year_bounds != tables.year_bounds:
+            raise ValueError("The kilometer or year thresholds changed, the fleet index must be rebuilt")
+
+        if old.base_rate_bounds != tables.base_rate_bounds or old.base_rates != tables.base_rates:
+            # any grade may now map to another base rate:
+            return list(self.buckets)
+
+        energies = _changed_keys(old.energy_grades, tables.energy_grades)
+        types = _changed_keys(old.vehicle_grades, tables.vehicle_grades)
+        passengers = _changed_keys(old.passenger_rates, tables.passenger_rates)
+        kilometers = _changed_indices(old.kilometer_grades, tables.kilometer_grades)
+        years = _changed_indices(old.year_grades, tables.year_grades)
+        if not (energies or types or passengers or kilometers or years):
+            return []
+        return [
+            key for key in self.buckets
+            if key[0] in energies or key[1] in kilometers or key[2] in types or key[3] in years or key[4] in passengers
+        ]
+
+    def update(self, tables, rates=None):
+        """
+        Switch the index to the provided tables and return the list of the RowMoves it caused.
+        If rates is given (a list or array indexed by row id, such as the rates of a columnar
+        fleet opened with ColumnarFleet.open_rates(writable=True)), only the moved rows are written to it.
+        Raises ValueError, leaving the index and rates untouched, if rates is given and
+        some indexed rows are no longer covered by the new tables. If writing to rates
+        fails, the index is left untouched as well.
+        """
+        # work out all the changes before applying any of them, so that
+        # an error can't leave the index half updated:
+        changes = []
+        for key in self.affected_keys(tables):
+            old_rate = self.rates[key]
+            new_rate = tables.bucket_rate(*key)
+            if new_rate != old_rate:
+                changes.append((key, old_rate, new_rate))
+
+        if rates is not None:
+            for key, _, new_rate in changes:
+                if new_rate is None:
+                    row_ids = self.buckets[key]
+                    raise ValueError(
+                        f"{len(row_ids)} rows (starting with row {row_ids[0]}) are no longer covered "
+                        f"by the tables, their rates can't be written"
+                    )
+
+        # write the rates first: if that fails (a read-only array for instance),
+        # the index must still describe the old tables.
+        if rates is not None:
+            for key, _, new_rate in changes:
+                for row_id in self.buckets[key]:
+                    rates[row_id] = new_rate
+
+        moves = []
+        for key, old_rate, new_rate in changes:
+            self.rates[key] = new_rate
+            for row_id in self.buckets[key]:
+                moves.append(RowMove(row_id, old_rate, new_rate))
+        self.tables = tables
+        moves.sort(key=lambda move: move.row_id)
+        return moves
@@ -0,0 +1,149 @@
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class LatencyStats:
+    """
+    The last few durations measured for one thing (a frame, an event handler...).
+    Only the most recent samples are kept, so memory stays bounded however long the application runs.
+    """
+    def __init__(self, size=1000):
+        self.samples = deque(maxlen=size)
+        self.count = 0  # total number of samples, including the ones that were dropped
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def percentile(self, p):
+        """
+        The p-th percentile (0 <= p <= 100) of the kept samples, in seconds.
+        """
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def as_dict(self):
+        """
+        A json-serializable summary of the samples, in milliseconds.
+        """
+        if not self.samples:
+            return {'count': self.count}
+
+        def ms(p):
+            return round(self.percentile(p) * 1000, 3)
+
+        return {
+            'count': self.count,
+            'p50': ms(50),
+            'p90': ms(90),
+            'p99': ms(99),
+            'max': round(max(self.samples) * 1000, 3),
+        }
+
+
+def batch_stats(batch):
+    """
+    Number of draw calls and of vertices a pyglet batch issues when drawn.
+    Each non-empty vertex domain of each group is drawn with one call.
+    """
+    draw_calls = 0
+    vertices = 0
+    for domains in batch.group_map.values():
+        for domain in domains.values():
+            if domain.is_empty:
+                continue
+            draw_calls += 1
+            vertices += sum(domain.allocator.sizes)
+    return draw_calls, vertices
+
+
+class Profiler:
+    """
+    Collects the timings of the GUI: time between frames, time spent in each
+    event handler, and time between a click on the 'calculate' button and the
+    drawing of the frame showing its result.
+    """
+    def __init__(self, size=1000):
+        self.size = size
+        self.handlers = {}  # handler name -> LatencyStats
+        self.frames = LatencyStats(size)
+        self.click_to_result = LatencyStats(size)
+        self.batches = {}  # batch name -> batch, counted only when a report is requested
+        self._last_frame = None
+        self._click = None
+
+    def stats(self, name):
+        stats = self.handlers.get(name, None)
+        if stats is None:
+            stats = self.handlers[name] = LatencyStats(self.size)
+        return stats
+
+    @contextmanager
+    def measure(self, name):
+        """
+        Measure the time spent in the 'with' block, under the provided name.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stats(name).add(time.perf_counter() - start)
+
+    def begin_click(self):
+        """
+        Called when the 'calculate' button is clicked.
+        """
+        self._click = time.perf_counter()
+
+    def frame_drawn(self, **batches):
+        """
+        Called at the end of each frame, with the batches that were drawn as keyword arguments.
+        Only references to the batches are kept here: walking them is left to the reports,
+        so that it doesn't slow down every frame.
+        """
+        now = time.perf_counter()
+        if self._last_frame is not None:
+            self.frames.add(now - self._last_frame)
+        self._last_frame = now
+        if self._click is not None:
+            self.click_to_result.add(now - self._click)
+            self._click = None
+        self.batches.update(batches)
+
+    def as_dict(self):
+        return {
+            'frames': self.frames.as_dict(),
+            'click_to_result': self.click_to_result.as_dict(),
+            'handlers': {name: stats.as_dict() for name, stats in self.handlers.items()},
+            'batches': {
+                name: dict(zip(('draw_calls', 'vertices'), batch_stats(batch))) for name, batch in self.batches.items()
+            },
+        }
+
+    def export(self, path):
+        """
+        Write the collected statistics to a json file.
+        """
+        with open(path, 'w', encoding='utf-8') as fs:
+            json.dump(self.as_dict(), fs, indent=2)
+
+    def report(self):
+        """
+        A short multi-line text summary of the statistics, in milliseconds.
+        """
+        def line(name, stats):
+            d = stats.as_dict()
+            if 'p50' not in d:
+                return f"{name}: -"
+            return f"{name}: p50 {d['p50']:.2f}  p90 {d['p90']:.2f}  p99 {d['p99']:.2f}  max {d['max']:.2f}"
+
+        lines = [line("frame", self.frames), line("click->result", self.click_to_result)]
+        lines += [line(name, stats) for name, stats in sorted(self.handlers.items())]
+        for name, batch in sorted(self.batches.items()):
+            calls, vertices = batch_stats(batch)
+            lines.append(f"{name}: {calls} draw calls, {vertices} vertices")
+        return "\n".join(lines)
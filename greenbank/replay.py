@@ -0,0 +1,166 @@
+import argparse
+import json
+import sys
+import time
+
+from .profiling import LatencyStats
+
+
+# the events of Root that are recorded and replayed:
+EVENTS = (
+    'on_mouse_motion',
+    'on_mouse_press',
+    'on_mouse_drag',
+    'on_text',
+    'on_text_motion',
+    'on_text_motion_select',
+)
+
+
+class Recorder:
+    """
+    Records the events received by a window to a json lines file, one event per line:
+    {"t": seconds since the recording started, "event": name, "args": [...]}.
+
+    The recorder is pushed on top of the window's handlers and never handles the
+    events itself, so the window keeps behaving normally while being recorded.
+    """
+    def __init__(self, path):
+        self._fs = open(path, 'w', encoding='utf-8')
+        self._start = time.perf_counter()
+        self.count = 0
+
+    def attach(self, window):
+        # register one handler per recorded event, all writing to our file:
+        window.push_handlers(**{name: self._handler(name) for name in EVENTS})
+        return self
+
+    def _handler(self, name):
+        def handler(*args):
+            self.record(name, args)
+        return handler
+
+    def record(self, name, args):
+        self._fs.write(json.dumps({'t': round(time.perf_counter() - self._start, 6), 'event': name, 'args': list(args)}))
+        self._fs.write("\n")
+        self.count += 1
+
+    def close(self):
+        self._fs.close()
+
+
+def load_events(path):
+    """
+    Read the events of a recording as a list of (name, args) pairs.
+    """
+    events = []
+    with open(path, encoding='utf-8') as fs:
+        for line in fs:
+            if line.strip():
+                event = json.loads(line)
+                events.append((event['event'], tuple(event['args'])))
+    return events
+
+
+class ReplayResult:
+    """
+    Timings of a replay: overall events per second, and dispatch latency per event.
+    """
+    def __init__(self):
+        self.events = 0
+        self.frames = 0
+        self.duration = 0.0
+        self.handlers = {}  # event name -> LatencyStats
+        self.draw = LatencyStats()
+
+    @property
+    def events_per_second(self):
+        return self.events / self.duration if self.duration else None
+
+    def as_dict(self):
+        return {
+            'events': self.events,
+            'frames': self.frames,
+            'duration': round(self.duration, 6),
+            'events_per_second': self.events_per_second,
+            'handlers': {name: stats.as_dict() for name, stats in self.handlers.items()},
+            'draw': self.draw.as_dict(),
+        }
+
+
+def replay(window, events, repeat=1, frame_every=0):
+    """
+    Feed recorded events to a window as fast as possible and measure how long each dispatch takes.
+    If frame_every is positive, a frame is drawn every frame_every events, so that
+    rendering costs are included in the measurements.
+    """
+    result = ReplayResult()
+    # outside of pyglet's event loop, windows queue their events instead of dispatching
+    # them; disable that like the event loop does, so each dispatch is synchronous:
+    window._enable_event_queue = False
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for name, args in events:
+            stats = result.handlers.get(name, None)
+            if stats is None:
+                stats = result.handlers[name] = LatencyStats()
+            t = time.perf_counter()
+            window.dispatch_event(name, *args)
+            stats.add(time.perf_counter() - t)
+            result.events += 1
+
+            if frame_every > 0 and result.events % frame_every == 0:
+                t = time.perf_counter()
+                window.switch_to()
+                window.dispatch_event('on_draw')
+                window.flip()
+                result.draw.add(time.perf_counter() - t)
+                result.frames += 1
+    result.duration = time.perf_counter() - start
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record or replay the events received by the application's window.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    record_parser = sub.add_parser('record', help="run the application and record its events")
+    record_parser.add_argument('path')
+    play_parser = sub.add_parser('play', help="replay recorded events as fast as possible")
+    play_parser.add_argument('path')
+    play_parser.add_argument('--repeat', type=int, default=1)
+    play_parser.add_argument('--frame-every', type=int, default=0, help="draw a frame every N events")
+    play_parser.add_argument('--visible', action='store_true', help="use a regular window instead of a headless context")
+    play_parser.add_argument('--report', help="write the timings to this json file")
+    args = parser.parse_args(argv)
+
+    import pyglet
+    if args.command == 'play' and not args.visible:
+        # must be set before pyglet.window is imported by our application module:
+        pyglet.options['headless'] = True
+    from . import application
+
+    if args.command == 'record':
+        root = application.Root()
+        recorder = Recorder(args.path).attach(root)
+        try:
+            application.run()
+        finally:
+            recorder.close()
+        print(f"{recorder.count} events recorded to {args.path}")
+        return
+
+    root = application.Root()
+    result = replay(root, load_events(args.path), args.repeat, args.frame_every)
+    report = result.as_dict()
+    # the handlers' own timings, as measured by the window's profiler:
+    report['profiler'] = root.profiler.as_dict()
+    root.close()
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as fs:
+            json.dump(report, fs, indent=2)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
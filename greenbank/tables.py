@@ -0,0 +1,146 @@
+import bisect
+import json
+import numbers
+import os
+
+from . import fixedpoint
+
+
+class RateTables:
+    """
+    The six grading and rate tables of a data directory, loaded once and kept in memory.
+
+    Threshold tables (kilometers, year and base rates) are stored as two parallel sorted
+    lists, one for the bounds and one for the associated values, so that looking up
+    the bucket a value falls in is a simple bisection.
+
+    Grades are held in tenths and rates in basis points (see the fixedpoint module),
+    the base rate bounds being grades as well.
+    """
+    FILES = {
+        'energy_grades': "energy_grades.json",
+        'kilometer_grades': "kilometer_grades.json",
+        'vehicle_grades': "vehicle_grades.json",
+        'year_grades': "year_grades.json",
+        'base_rates': "base_borrowing_rates.json",
+        'passenger_rates': "passenger_borrowing_rates.json",
+    }
+
+    def __init__(self, energy_grades, kilometer_grades, vehicle_grades, year_grades, base_rates, passenger_rates):
+        to_grade = fixedpoint.to_grade
+        to_rate = fixedpoint.to_rate
+        self.energy_grades = {k: to_grade(v) for k, v in energy_grades.items()}
+        self.vehicle_grades = {k: to_grade(v) for k, v in vehicle_grades.items()}
+        self.passenger_rates = {int(k): to_rate(v) for k, v in passenger_rates.items()}
+
+        self.kilometer_bounds, self.kilometer_grades = self._thresholds(kilometer_grades, int, to_grade)
+        self.year_bounds, self.year_grades = self._thresholds(year_grades, int, to_grade)
+        self.base_rate_bounds, self.base_rates = self._thresholds(base_rates, to_grade, to_rate)
+
+    @staticmethod
+    def _thresholds(table, convert_bound, convert_value):
+        """
+        Split a threshold table into its sorted bounds and their values.
+        """
+        items = sorted((convert_bound(k), convert_value(v)) for k, v in table.items())
+        return [k for k, _ in items], [v for _, v in items]
+
+    @classmethod
+    def load(cls, directory="data"):
+        """
+        Load the tables from the json files of the provided directory.
+        """
+        tables = {}
+        for name, filename in cls.FILES.items():
+            with open(os.path.join(directory, filename)) as fs:
+                tables[name] = json.load(fs)
+        return cls(**tables)
+
+    def as_dict(self):
+        """
+        The tables as json-serializable dicts, in the format of the data files.
+        RateTables(**tables.as_dict()) gives back equivalent tables.
+        """
+        grade = fixedpoint.grade_value
+        rate = fixedpoint.rate_value
+        return {
+            'energy_grades': {k: grade(v) for k, v in self.energy_grades.items()},
+            'kilometer_grades': {str(k): grade(v) for k, v in zip(self.kilometer_bounds, self.kilometer_grades)},
+            'vehicle_grades': {k: grade(v) for k, v in self.vehicle_grades.items()},
+            'year_grades': {str(k): grade(v) for k, v in zip(self.year_bounds, self.year_grades)},
+            'base_rates': {str(grade(k)): rate(v) for k, v in zip(self.base_rate_bounds, self.base_rates)},
+            'passenger_rates': {str(k): rate(v) for k, v in self.passenger_rates.items()},
+        }
+
+    # the next few methods return None when the value is not covered
+    # by the corresponding table, like dict.get() does.
+
+    def energy_grade(self, energy):
+        return self.energy_grades.get(energy, None)
+
+    def vehicle_grade(self, vehicle_type):
+        return self.vehicle_grades.get(vehicle_type, None)
+
+    def kilometer_bucket(self, kilometers):
+        """
+        Index of the kilometer threshold the provided distance falls under.
+        """
+        i = bisect.bisect_right(self.kilometer_bounds, kilometers / 1000)
+        return i if i < len(self.kilometer_bounds) else None
+
+    def kilometer_grade(self, kilometers):
+        i = self.kilometer_bucket(kilometers)
+        return None if i is None else self.kilometer_grades[i]
+
+    def year_bucket(self, year):
+        """
+        Index of the year threshold the provided assembling year falls under.
+        """
+        i = bisect.bisect_right(self.year_bounds, year)
+        return i if i < len(self.year_bounds) else None
+
+    def year_grade(self, year):
+        i = self.year_bucket(year)
+        return None if i is None else self.year_grades[i]
+
+    def base_rate(self, grade):
+        i = bisect.bisect_left(self.base_rate_bounds, grade)
+        return self.base_rates[i] if i < len(self.base_rate_bounds) else None
+
+    def passenger_rate(self, passenger_count):
+        # a count of another type (such as a string read from a file) is a bad row,
+        # not a count the tables don't cover:
+        if not isinstance(passenger_count, numbers.Integral):
+            raise TypeError(f"Passenger count must be an int, not {type(passenger_count).__name__}")
+        return self.passenger_rates.get(passenger_count, None)
+
+    def bucket_rate(self, energy, kilometer_bucket, vehicle_type, year_bucket, passenger_count):
+        """
+        Calculate the borrowing rate, in basis points, of a vehicle whose kilometers and year
+        were already reduced to their bucket indices (see kilometer_bucket() and year_bucket()).
+        Returns None if one of the parameters isn't covered by the tables.
+        """
+        if kilometer_bucket is None or year_bucket is None:
+            return None
+        energy_grade = self.energy_grade(energy)
+        vehicle_grade = self.vehicle_grade(vehicle_type)
+        if energy_grade is None or vehicle_grade is None:
+            return None
+        grade = energy_grade + self.kilometer_grades[kilometer_bucket] + vehicle_grade + self.year_grades[year_bucket]
+        base_rate = self.base_rate(grade)
+        rate_addition = self.passenger_rate(passenger_count)
+        if base_rate is None or rate_addition is None:
+            return None
+        return base_rate + rate_addition
+
+    def borrowing_rate(self, energy, kilometers, vehicle_type, year, passenger_count):
+        """
+        Calculate the borrowing rate of a single vehicle, in basis points.
+        Raises ValueError if one of the parameters isn't covered by the tables.
+        """
+        rate = self.bucket_rate(
+            energy, self.kilometer_bucket(kilometers), vehicle_type, self.year_bucket(year), passenger_count
+        )
+        if rate is None:
+            raise ValueError(f"Vehicle not covered by the tables: {(energy, kilometers, vehicle_type, year, passenger_count)}")
+        return rate
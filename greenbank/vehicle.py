@@ -1,61 +1,47 @@
-import json
+from .tables import RateTables
 
 
 class Vehicle:
-    def __init__(self, energy_type, kilometers, vehicle_type, assembling_year, passenger_count):
+    def __init__(self, energy_type, kilometers, vehicle_type, assembling_year, passenger_count, tables=None):
         self.energy = energy_type
         self.kilometers = kilometers
         self.type = vehicle_type
         self.year = assembling_year
         self.passenger_count = passenger_count
+        # the tables are read from the data directory unless already loaded ones are provided:
+        self.tables = tables if tables is not None else RateTables.load()
+
+    # grades are calculated in tenths and rates in basis points, see the fixedpoint module.
+    # like RateTables.borrowing_rate(), these raise ValueError when the vehicle isn't covered by the tables.
+
+    def _not_covered(self):
+        return ValueError(
+            f"Vehicle not covered by the tables: {(self.energy, self.kilometers, self.type, self.year, self.passenger_count)}"
+        )
 
     def calculate_grade(self):
-        with open("data/energy_grades.json") as fs:
-            energy_grades = json.load(fs)
-        energy_grade = energy_grades.get(self.energy, None)
-
-        with open("data/kilometer_grades.json") as fs:
-            kilometer_grades = json.load(fs)
-        kilometer_grade = None
-        for k, v in kilometer_grades.items():
-            if (self.kilometers / 1000) < int(k):
-                kilometer_grade = v
-                break
-
-        with open("data/vehicle_grades.json") as fs:
-            vehicle_grades = json.load(fs)
-        vehicle_grade = vehicle_grades.get(self.type, None)
-
-        with open("data/year_grades.json") as fs:
-            year_grades = json.load(fs)
-        year_grade = None
-        for k, v in year_grades.items():
-            if self.year < int(k):
-                year_grade = v
-                break
+        energy_grade = self.tables.energy_grade(self.energy)
+        kilometer_grade = self.tables.kilometer_grade(self.kilometers)
+        vehicle_grade = self.tables.vehicle_grade(self.type)
+        year_grade = self.tables.year_grade(self.year)
+        if None in (energy_grade, kilometer_grade, vehicle_grade, year_grade):
+            raise self._not_covered()
 
         return energy_grade + kilometer_grade + vehicle_grade + year_grade
 
     def calculate_base_borrowing_rate(self):
         grade = self.calculate_grade()
 
-        with open("data/base_borrowing_rates.json") as fs:
-            rates = json.load(fs)
-        rate = None
-        for k, v in rates.items():
-            if grade <= int(k):
-                rate = v
-                break
-
+        rate = self.tables.base_rate(grade)
+        if rate is None:
+            raise self._not_covered()
         return rate
 
     def calculate_borrowing_rate(self):
         base_rate = self.calculate_base_borrowing_rate()
 
-        with open("data/passenger_borrowing_rates.json") as fs:
-            passenger_rates = json.load(fs)
-
-        rate_addition = passenger_rates.get(str(self.passenger_count), None)
+        rate_addition = self.tables.passenger_rate(self.passenger_count)
+        if rate_addition is None:
+            raise self._not_covered()
 
         return base_rate + rate_addition
-